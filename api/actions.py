@@ -0,0 +1,23 @@
+from http.server import BaseHTTPRequestHandler
+from lib.interactions import read_interaction, collect_effects, run_effects
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        """Run the side effects of an interaction acknowledged by api/response"""
+        # Get content length to read the body
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length).decode('utf-8')
+
+        # The forwarded request keeps Slack's signature
+        status, payload, workspace = read_interaction(self.headers, post_data)
+        if status:
+            self.send_response(status)
+            self.end_headers()
+            return
+
+        run_effects(collect_effects(payload, workspace))
+
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
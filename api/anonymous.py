@@ -5,8 +5,9 @@ from urllib.parse import parse_qs
 import os
 import json
 from datetime import datetime
-from lib.database import store_message, get_channel_mode, store_inappropriate_message, get_or_assign_pseudo, get_user_by_pseudo, get_known_pseudos
+from lib.database import store_message, get_channel_mode, store_inappropriate_message, get_or_assign_pseudo, get_user_by_pseudo, get_known_pseudos, record_mention_dms
 from lib.slack import verify_slack_request, send_direct_message
+from lib.workspaces import get_workspace
 from lib.openai import generate_response
 from lib.types import ChannelMode
 
@@ -30,16 +31,6 @@ class handler(BaseHTTPRequestHandler):
         content_length = int(self.headers['Content-Length'])
         post_data = self.rfile.read(content_length).decode('utf-8')
 
-        # Verify request is from Slack only in production
-        if os.getenv('VERCEL_ENV') == 'production':
-            timestamp = self.headers.get('X-Slack-Request-Timestamp')
-            signature = self.headers.get('X-Slack-Signature')
-
-            if not timestamp or not signature or not verify_slack_request(timestamp, post_data, signature):
-                self.send_response(401)
-                self.end_headers()
-                return
-
         # Parse form data
         params = parse_qs(post_data)
         # Extract Slack command parameters
@@ -57,13 +48,30 @@ class handler(BaseHTTPRequestHandler):
             'api_app_id': params.get('api_app_id', [''])[0]
         }
 
+        # Resolve the workspace shard and credentials
+        workspace = get_workspace(slack_params['team_id'], slack_params['enterprise_id'])
+        if workspace is None:
+            self.send_response(401)
+            self.end_headers()
+            return
+
+        # Verify request is from Slack only in production
+        if os.getenv('VERCEL_ENV') == 'production':
+            timestamp = self.headers.get('X-Slack-Request-Timestamp')
+            signature = self.headers.get('X-Slack-Signature')
+
+            if not timestamp or not signature or not workspace['signing_secret'] or not verify_slack_request(timestamp, post_data, signature, workspace['signing_secret']):
+                self.send_response(401)
+                self.end_headers()
+                return
+
         # Special handling for the BMT channel
         if slack_params['channel_id'] == SPECIAL_CHANNEL_ID:
-            self.handle_special_channel(slack_params)
+            self.handle_special_channel(slack_params, workspace)
             return
 
         # Get channel mode and prepare message text
-        channel_mode = get_channel_mode(slack_params['channel_id'])
+        channel_mode = get_channel_mode(workspace['team_id'], slack_params['channel_id'])
         
         # Check if channel mode is enabled
         if channel_mode not in (ChannelMode.FREE, ChannelMode.RESTRICTED):
@@ -88,6 +96,7 @@ class handler(BaseHTTPRequestHandler):
             if result.strip() == "1":  # Message is inappropriate
                 # Store the inappropriate message
                 store_inappropriate_message(
+                    workspace['team_id'],
                     message_text,
                     slack_params['channel_id'],
                     slack_params['channel_name']
@@ -106,6 +115,7 @@ class handler(BaseHTTPRequestHandler):
 
         # Store message in database
         store_message(
+            workspace['team_id'],
             stored_message_text,
             slack_params['user_id'],
             slack_params['channel_id'],
@@ -114,7 +124,7 @@ class handler(BaseHTTPRequestHandler):
         )
 
         # Get pseudo for the user
-        pseudo = get_or_assign_pseudo(slack_params['user_id'], slack_params['channel_id'])
+        pseudo = get_or_assign_pseudo(workspace['team_id'], slack_params['user_id'], slack_params['channel_id'])
 
         # April Fools' Day easter egg: use real username and add fish emoji
         april_fools = is_april_fools()
@@ -123,17 +133,23 @@ class handler(BaseHTTPRequestHandler):
 
         # Detect @Pseudo mentions and notify users
         mentioned_pseudos = re.findall(r'@(\w+)', message_text)
+        mention_dms_sent = 0
         for mentioned_pseudo in mentioned_pseudos:
             # Look up the user who owns this pseudo (case-insensitive match)
             for known_pseudo in get_known_pseudos():
                 if known_pseudo.lower() == mentioned_pseudo.lower():
-                    target_user_id = get_user_by_pseudo(known_pseudo, slack_params['channel_id'])
+                    target_user_id = get_user_by_pseudo(workspace['team_id'], known_pseudo, slack_params['channel_id'])
                     if target_user_id and target_user_id != slack_params['user_id']:
                         res = send_direct_message(
                             target_user_id,
-                            f"🔔 *{display_name}* t'a mentionné dans un message anonyme dans le canal <#{slack_params['channel_id']}> !\n\n> {message_text}"
+                            f"🔔 *{display_name}* t'a mentionné dans un message anonyme dans le canal <#{slack_params['channel_id']}> !\n\n> {message_text}",
+                            workspace['bot_token']
                         )
+                        if res:
+                            mention_dms_sent += 1
                     break
+        if mention_dms_sent:
+            record_mention_dms(workspace['team_id'], slack_params['channel_id'], mention_dms_sent)
 
         # Send delayed response to response_url
         delayed_response = {
@@ -153,7 +169,7 @@ class handler(BaseHTTPRequestHandler):
 
         return
 
-    def handle_special_channel(self, slack_params):
+    def handle_special_channel(self, slack_params, workspace):
         """Handle messages for the special BMT channel"""
         message_text = slack_params['text'].strip()
         
@@ -171,6 +187,7 @@ class handler(BaseHTTPRequestHandler):
 
         # Store message in database
         store_message(
+            workspace['team_id'],
             message_text,
             slack_params['user_id'],
             slack_params['channel_id'],
@@ -2,6 +2,7 @@ from http.server import BaseHTTPRequestHandler
 from urllib.parse import parse_qs
 import os
 from lib.slack import verify_slack_request
+from lib.workspaces import get_workspace
 from lib.database import update_channel_mode, is_admin
 from lib.types import ChannelMode
 
@@ -12,16 +13,6 @@ class handler(BaseHTTPRequestHandler):
         content_length = int(self.headers['Content-Length'])
         post_data = self.rfile.read(content_length).decode('utf-8')
 
-        # Verify request is from Slack only in production
-        if os.getenv('VERCEL_ENV') == 'production':
-            timestamp = self.headers.get('X-Slack-Request-Timestamp')
-            signature = self.headers.get('X-Slack-Signature')
-
-            if not timestamp or not signature or not verify_slack_request(timestamp, post_data, signature):
-                self.send_response(401)
-                self.end_headers()
-                return
-
         # Parse form data
         params = parse_qs(post_data)
         slack_params = {
@@ -31,10 +22,29 @@ class handler(BaseHTTPRequestHandler):
             'channel_id': params.get('channel_id', [''])[0],
             'channel_name': params.get('channel_name', [''])[0],
             'user_id': params.get('user_id', [''])[0],
+            'team_id': params.get('team_id', [''])[0],
+            'enterprise_id': params.get('enterprise_id', [''])[0],
         }
 
+        # Resolve the workspace shard and credentials
+        workspace = get_workspace(slack_params['team_id'], slack_params['enterprise_id'])
+        if workspace is None:
+            self.send_response(401)
+            self.end_headers()
+            return
+
+        # Verify request is from Slack only in production
+        if os.getenv('VERCEL_ENV') == 'production':
+            timestamp = self.headers.get('X-Slack-Request-Timestamp')
+            signature = self.headers.get('X-Slack-Signature')
+
+            if not timestamp or not signature or not workspace['signing_secret'] or not verify_slack_request(timestamp, post_data, signature, workspace['signing_secret']):
+                self.send_response(401)
+                self.end_headers()
+                return
+
         # Check if user is admin
-        if not is_admin(slack_params['user_id']):
+        if not is_admin(workspace['team_id'], slack_params['user_id']):
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
             self.end_headers()
@@ -61,7 +71,7 @@ class handler(BaseHTTPRequestHandler):
 
         # Update channel configuration
         try:
-            update_channel_mode(slack_params['channel_id'], mode)
+            update_channel_mode(workspace['team_id'], slack_params['channel_id'], mode)
         except Exception as e:
             self.send_response(200)
             self.send_header('Content-type', 'application/json')
@@ -1,8 +1,5 @@
 from http.server import BaseHTTPRequestHandler
-from urllib.parse import parse_qs
-import os
-import json
-from lib.slack import verify_slack_request, send_direct_message, update_message_via_response_url
+from lib.interactions import read_interaction, collect_effects, run_effects, get_worker_url, dispatch_to_worker
 
 
 class handler(BaseHTTPRequestHandler):
@@ -15,66 +12,32 @@ class handler(BaseHTTPRequestHandler):
         self.handle_interactive_component(post_data)
 
     def handle_interactive_component(self, post_data):
-        """Handle interactive component interactions (button clicks)"""
-        # Parse the payload
-        params = parse_qs(post_data)
-        payload_str = params.get('payload', [''])[0]
-        
-        try:
-            payload = json.loads(payload_str)
-        except json.JSONDecodeError:
-            self.send_response(400)
+        """Handle interactive component interactions (button clicks)
+
+        Side effects are handed to the api/actions worker before the ack, which
+        adds the worker connection and up to 50ms to the response. Without a
+        worker, or when it fails to take them, they run in process after the
+        ack, which only holds the connection open behind a complete response
+        (Vercel buffers the response, so there they still delay it).
+        """
+        status, payload, workspace = read_interaction(self.headers, post_data)
+        if status:
+            self.send_response(status)
             self.end_headers()
             return
 
-        # Verify request is from Slack only in production
-        if os.getenv('VERCEL_ENV') == 'production':
-            timestamp = self.headers.get('X-Slack-Request-Timestamp')
-            signature = self.headers.get('X-Slack-Signature')
+        effects = collect_effects(payload, workspace)
 
-            if not timestamp or not signature or not verify_slack_request(timestamp, post_data, signature):
-                self.send_response(401)
-                self.end_headers()
-                return
+        deferred = False
+        worker_url = get_worker_url()
+        if effects and worker_url:
+            deferred = dispatch_to_worker(worker_url, self.headers, post_data)
 
-        # Handle the "Go" button click
-        if (payload.get('type') == 'block_actions' and 
-            len(payload.get('actions', [])) > 0 and 
-            payload['actions'][0].get('action_id') == 'go_button'):
-            
-            # Get the original poster's user ID from the button value
-            original_poster_id = payload['actions'][0].get('value')
-            # Get the user who clicked the button
-            button_clicker_id = payload.get('user', {}).get('id')
-            
-            if original_poster_id and button_clicker_id:
-                # Envoyer un message privé à l'auteur original
-                message = f"Hé ! Quelqu'un veut que tu viennes jouer ! 🎮"
-                send_direct_message(original_poster_id, message)
-                
-                # Update the original message using response_url
-                response_url = payload.get('response_url')
-                if response_url:
-                    # Get the original message text from the payload
-                    original_message = payload.get('message', {})
-                    original_text = original_message.get('text', '')
-                    
-                    # Update the message in place without the button
-                    blocks = [
-                        {
-                            'type': 'section',
-                            'text': {
-                                'type': 'mrkdwn',
-                                'text': original_text
-                            }
-                        }
-                    ]
-                    update_message_via_response_url(response_url, original_text, blocks)
-                
-                self.send_response(200)
-                self.end_headers()
-                return
-
-        # Default response for unhandled interactions
+        # Acknowledge, Slack only needs the 200
         self.send_response(200)
-        self.end_headers() 
\ No newline at end of file
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        self.wfile.flush()
+
+        if effects and not deferred:
+            run_effects(effects)
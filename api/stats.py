@@ -0,0 +1,114 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+import os
+from lib.slack import verify_slack_request
+from lib.workspaces import get_workspace
+from lib.database import get_channel_stats, is_admin
+
+DEFAULT_DAYS = 7
+MAX_DAYS = 31
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        # Get content length to read the body
+        content_length = int(self.headers['Content-Length'])
+        post_data = self.rfile.read(content_length).decode('utf-8')
+
+        # Parse form data
+        params = parse_qs(post_data)
+        slack_params = {
+            'command': params.get('command', [''])[0],
+            'text': params.get('text', [''])[0].strip(),  # Number of days to report
+            'response_url': params.get('response_url', [''])[0],
+            'channel_id': params.get('channel_id', [''])[0],
+            'channel_name': params.get('channel_name', [''])[0],
+            'user_id': params.get('user_id', [''])[0],
+            'team_id': params.get('team_id', [''])[0],
+            'enterprise_id': params.get('enterprise_id', [''])[0],
+        }
+
+        # Resolve the workspace shard and credentials
+        workspace = get_workspace(slack_params['team_id'], slack_params['enterprise_id'])
+        if workspace is None:
+            self.send_response(401)
+            self.end_headers()
+            return
+
+        # Verify request is from Slack only in production
+        if os.getenv('VERCEL_ENV') == 'production':
+            timestamp = self.headers.get('X-Slack-Request-Timestamp')
+            signature = self.headers.get('X-Slack-Signature')
+
+            if not timestamp or not signature or not workspace['signing_secret'] or not verify_slack_request(timestamp, post_data, signature, workspace['signing_secret']):
+                self.send_response(401)
+                self.end_headers()
+                return
+
+        # Check if user is admin
+        if not is_admin(workspace['team_id'], slack_params['user_id']):
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            response = {
+                'response_type': 'ephemeral',
+                'text': "Sorry, only administrators can view channel stats."
+            }
+            self.wfile.write(bytes(str(response), 'utf-8'))
+            return
+
+        # Validate the number of days
+        days = DEFAULT_DAYS
+        if slack_params['text']:
+            if not slack_params['text'].isdigit() or not 1 <= int(slack_params['text']) <= MAX_DAYS:
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json')
+                self.end_headers()
+                response = {
+                    'response_type': 'ephemeral',
+                    'text': f"Invalid number of days. Please use a number between 1 and {MAX_DAYS}."
+                }
+                self.wfile.write(bytes(str(response), 'utf-8'))
+                return
+            days = int(slack_params['text'])
+
+        # Read the precomputed daily rollups
+        try:
+            rows = get_channel_stats(workspace['team_id'], slack_params['channel_id'], days)
+        except Exception as e:
+            self.send_response(200)
+            self.send_header('Content-type', 'application/json')
+            self.end_headers()
+            response = {
+                'response_type': 'ephemeral',
+                'text': f"Error fetching channel stats: {str(e)}"
+            }
+            self.wfile.write(bytes(str(response), 'utf-8'))
+            return
+
+        total_posts = sum(row[1] for row in rows)
+        total_rejections = sum(row[2] for row in rows)
+        total_mention_dms = sum(row[4] for row in rows)
+        submitted = total_posts + total_rejections
+        rejection_rate = 100 * total_rejections / submitted if submitted else 0
+
+        lines = [
+            f"Stats for the last {days} day(s):",
+            f"Posts: {total_posts} | Rejections: {total_rejections} ({rejection_rate:.1f}%) | Mention DMs: {total_mention_dms}",
+        ]
+        for day, posts, rejections, distinct_posters, mention_dms in rows:
+            lines.append(
+                f"{day.isoformat()}: {posts} posts, {rejections} rejections, "
+                f"{distinct_posters} posters, {mention_dms} mention DMs"
+            )
+
+        # Send success response
+        self.send_response(200)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+
+        response = {
+            'response_type': 'ephemeral',
+            'text': '\n'.join(lines)
+        }
+        self.wfile.write(bytes(str(response), 'utf-8'))
@@ -1,56 +1,96 @@
-import os
 import psycopg2
+from psycopg2.extras import execute_values
 import random
 from datetime import datetime, timedelta
 from .types import ChannelMode
-
-
-def get_db_connection():
-    """Get a PostgreSQL database connection"""
-    return psycopg2.connect(os.getenv('DATABASE_URL'))
-
-
-def update_channel_mode(channel_id, mode):
+from .workspaces import get_workspace
+
+# Every table carries a team_id column, part of its primary key, and every
+# query is scoped by it so several workspaces can share a database without ID
+# collisions. Each workspace is routed to its own database and/or schema by
+# the shard map in lib/workspaces.py.
+#
+# Migration of a single-workspace database, backfilling existing rows with the
+# team_id of the workspace already served ('T0123' here). Primary key names
+# are PostgreSQL's defaults:
+#
+#   BEGIN;
+#   ALTER TABLE channel_configs ADD COLUMN team_id TEXT NOT NULL DEFAULT 'T0123';
+#   ALTER TABLE admin_users ADD COLUMN team_id TEXT NOT NULL DEFAULT 'T0123';
+#   ALTER TABLE pseudos ADD COLUMN team_id TEXT NOT NULL DEFAULT 'T0123';
+#   ALTER TABLE messages ADD COLUMN team_id TEXT NOT NULL DEFAULT 'T0123';
+#   ALTER TABLE inappropriate_messages ADD COLUMN team_id TEXT NOT NULL DEFAULT 'T0123';
+#
+#   ALTER TABLE channel_configs ALTER COLUMN team_id DROP DEFAULT;
+#   ALTER TABLE admin_users ALTER COLUMN team_id DROP DEFAULT;
+#   ALTER TABLE pseudos ALTER COLUMN team_id DROP DEFAULT;
+#   ALTER TABLE messages ALTER COLUMN team_id DROP DEFAULT;
+#   ALTER TABLE inappropriate_messages ALTER COLUMN team_id DROP DEFAULT;
+#
+#   ALTER TABLE channel_configs DROP CONSTRAINT channel_configs_pkey, ADD PRIMARY KEY (team_id, channel_id);
+#   ALTER TABLE admin_users DROP CONSTRAINT admin_users_pkey, ADD PRIMARY KEY (team_id, user_id);
+#   ALTER TABLE pseudos DROP CONSTRAINT pseudos_pkey, ADD PRIMARY KEY (team_id, user_id, channel_id);
+#   CREATE INDEX messages_team_channel_idx ON messages (team_id, channel_id);
+#   CREATE INDEX inappropriate_messages_team_channel_idx ON inappropriate_messages (team_id, channel_id);
+#   COMMIT;
+#
+# The channel_daily_stats and channel_daily_posters rollups are created with
+# team_id already, see their DDL below.
+
+
+def get_db_connection(team_id):
+    """Get a PostgreSQL database connection to the shard of a workspace"""
+    workspace = get_workspace(team_id)
+    if workspace is None:
+        raise ValueError(f"Unknown workspace: {team_id}")
+    if workspace['schema']:
+        return psycopg2.connect(workspace['database_url'], options=f"-c search_path={workspace['schema']}")
+    return psycopg2.connect(workspace['database_url'])
+
+
+def update_channel_mode(team_id, channel_id, mode):
     """Update or insert channel configuration"""
     if not isinstance(mode, ChannelMode):
         raise ValueError("Mode must be a ChannelMode enum value")
 
-    conn = get_db_connection()
+    conn = get_db_connection(team_id)
     cur = conn.cursor()
 
     cur.execute('''
-        INSERT INTO channel_configs (channel_id, mode, updated_at)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (channel_id) 
+        INSERT INTO channel_configs (team_id, channel_id, mode, updated_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (team_id, channel_id) 
         DO UPDATE SET mode = EXCLUDED.mode, updated_at = EXCLUDED.updated_at
-    ''', (channel_id, mode.value, datetime.now()))
+    ''', (team_id, channel_id, mode.value, datetime.now()))
 
     conn.commit()
     cur.close()
     conn.close()
 
 
-def store_message(text, user_id, channel_id, channel_name, response_url):
+def store_message(team_id, text, user_id, channel_id, channel_name, response_url):
     """Store a new message in the database"""
-    conn = get_db_connection()
+    conn = get_db_connection(team_id)
     cur = conn.cursor()
 
+    now = datetime.now()
     cur.execute('''
-        INSERT INTO messages (text, user_id, channel_id, channel_name, response_url, created_at)
-        VALUES (%s, %s, %s, %s, %s, %s)
-    ''', (text, user_id, channel_id, channel_name, response_url, datetime.now()))
+        INSERT INTO messages (team_id, text, user_id, channel_id, channel_name, response_url, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ''', (team_id, text, user_id, channel_id, channel_name, response_url, now))
+    _record_channel_activity(cur, team_id, channel_id, now.date(), posts=1, poster_id=user_id)
 
     conn.commit()
     cur.close()
     conn.close()
 
 
-def is_admin(user_id):
-    """Check if a user is an admin"""
-    conn = get_db_connection()
+def is_admin(team_id, user_id):
+    """Check if a user is an admin of a workspace"""
+    conn = get_db_connection(team_id)
     cur = conn.cursor()
 
-    cur.execute('SELECT EXISTS(SELECT 1 FROM admin_users WHERE user_id = %s)', (user_id,))
+    cur.execute('SELECT EXISTS(SELECT 1 FROM admin_users WHERE team_id = %s AND user_id = %s)', (team_id, user_id))
     is_admin = cur.fetchone()[0]
 
     cur.close()
@@ -59,19 +99,20 @@ def is_admin(user_id):
     return is_admin
 
 
-def get_channel_mode(channel_id):
+def get_channel_mode(team_id, channel_id):
     """Get the mode for a channel, defaults to DISABLED if not configured
     
     Args:
+        team_id (str): The Slack team ID
         channel_id (str): The Slack channel ID
         
     Returns:
         ChannelMode: The channel's mode (DISABLED if not configured)
     """
-    conn = get_db_connection()
+    conn = get_db_connection(team_id)
     cur = conn.cursor()
     
-    cur.execute('SELECT mode FROM channel_configs WHERE channel_id = %s', (channel_id,))
+    cur.execute('SELECT mode FROM channel_configs WHERE team_id = %s AND channel_id = %s', (team_id, channel_id))
     result = cur.fetchone()
     channel_mode = ChannelMode(result[0]) if result else ChannelMode.DISABLED
     
@@ -81,27 +122,131 @@ def get_channel_mode(channel_id):
     return channel_mode
 
 
-def store_inappropriate_message(text, channel_id, channel_name):
+def store_inappropriate_message(team_id, text, channel_id, channel_name):
     """Store an inappropriate message in the dedicated table
     
     Args:
+        team_id (str): The Slack team ID
         text (str): The message content
         channel_id (str): The Slack channel ID
         channel_name (str): The Slack channel name
     """
-    conn = get_db_connection()
+    conn = get_db_connection(team_id)
     cur = conn.cursor()
 
+    now = datetime.now()
     cur.execute('''
-        INSERT INTO inappropriate_messages (message_text, channel_id, channel_name, created_at)
-        VALUES (%s, %s, %s, %s)
-    ''', (text, channel_id, channel_name, datetime.now()))
+        INSERT INTO inappropriate_messages (team_id, message_text, channel_id, channel_name, created_at)
+        VALUES (%s, %s, %s, %s, %s)
+    ''', (team_id, text, channel_id, channel_name, now))
+    _record_channel_activity(cur, team_id, channel_id, now.date(), rejections=1)
 
     conn.commit()
     cur.close()
     conn.close()
+
+
+# Per-channel, per-day rollups maintained on write so stats never scan the
+# messages tables:
+#
+#   CREATE TABLE channel_daily_stats (
+#       team_id TEXT NOT NULL,
+#       channel_id TEXT NOT NULL,
+#       day DATE NOT NULL,
+#       posts INTEGER NOT NULL DEFAULT 0,
+#       rejections INTEGER NOT NULL DEFAULT 0,
+#       distinct_posters INTEGER NOT NULL DEFAULT 0,
+#       mention_dms INTEGER NOT NULL DEFAULT 0,
+#       PRIMARY KEY (team_id, channel_id, day)
+#   );
+#
+#   CREATE TABLE channel_daily_posters (
+#       team_id TEXT NOT NULL,
+#       channel_id TEXT NOT NULL,
+#       day DATE NOT NULL,
+#       user_id TEXT NOT NULL,
+#       PRIMARY KEY (team_id, channel_id, day, user_id)
+#   );
+def _record_channel_activity(cur, team_id, channel_id, day, posts=0, rejections=0, mention_dms=0, poster_id=None):
+    """Increment the daily rollup counters of a channel
     
+    Args:
+        cur: An open database cursor (the caller commits)
+        team_id (str): The Slack team ID
+        channel_id (str): The Slack channel ID
+        day (date): The day to account the activity to
+        posts (int): Number of posted messages to add
+        rejections (int): Number of rejected messages to add
+        mention_dms (int): Number of mention DMs sent to add
+        poster_id (str, optional): The posting user, counted once per day
+    """
+    new_posters = 0
+    if poster_id:
+        cur.execute('''
+            INSERT INTO channel_daily_posters (team_id, channel_id, day, user_id)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT DO NOTHING
+        ''', (team_id, channel_id, day, poster_id))
+        new_posters = cur.rowcount
+
+    cur.execute('''
+        INSERT INTO channel_daily_stats (team_id, channel_id, day, posts, rejections, distinct_posters, mention_dms)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (team_id, channel_id, day)
+        DO UPDATE SET posts = channel_daily_stats.posts + EXCLUDED.posts,
+                      rejections = channel_daily_stats.rejections + EXCLUDED.rejections,
+                      distinct_posters = channel_daily_stats.distinct_posters + EXCLUDED.distinct_posters,
+                      mention_dms = channel_daily_stats.mention_dms + EXCLUDED.mention_dms
+    ''', (team_id, channel_id, day, posts, rejections, new_posters, mention_dms))
+
+
+def record_mention_dms(team_id, channel_id, count):
+    """Account mention DMs sent for a message posted in a channel
+    
+    Args:
+        team_id (str): The Slack team ID
+        channel_id (str): The Slack channel ID
+        count (int): Number of DMs sent
+    """
+    conn = get_db_connection(team_id)
+    cur = conn.cursor()
+
+    _record_channel_activity(cur, team_id, channel_id, datetime.now().date(), mention_dms=count)
+
+    conn.commit()
+    cur.close()
+    conn.close()
+
+
+def get_channel_stats(team_id, channel_id, days=7) -> list:
+    """Get the daily rollups of a channel for the last days
     
+    Args:
+        team_id (str): The Slack team ID
+        channel_id (str): The Slack channel ID
+        days (int): Number of days to return, including today
+        
+    Returns:
+        list: (day, posts, rejections, distinct_posters, mention_dms) tuples, most recent first
+    """
+    conn = get_db_connection(team_id)
+    cur = conn.cursor()
+
+    since = datetime.now().date() - timedelta(days=days - 1)
+    cur.execute('''
+        SELECT day, posts, rejections, distinct_posters, mention_dms
+        FROM channel_daily_stats
+        WHERE team_id = %s AND channel_id = %s AND day >= %s
+        ORDER BY day DESC
+    ''', (team_id, channel_id, since))
+    rows = cur.fetchall()
+
+    cur.close()
+    conn.close()
+
+    return rows
+
+
 
 PSEUDOS = [
     # Animaux
@@ -132,32 +277,170 @@ PSEUDOS = [
     "Modulo", "Voxel", "Turbo", "Synchro", "Kappa", "Orbiton", "Pixel", "Numa", "Ionix", "Scalar",
     "Kronos", "Solis", "Lumen", "Holo", "Aero", "Ionis"
 ]
-def get_or_assign_pseudo(user_id, channel_id, validity_hours=1) -> str:
-    """Get or assign a pseudo for a user in a channel"""
-    conn = get_db_connection()
-    cur = conn.cursor()
+# In-process cache of assigned pseudos: (team_id, user_id, channel_id) -> entry dict with
+# 'pseudo', 'last_used' (last post seen by this process) and 'persisted' (the
+# last_used value currently stored in the database), plus a reverse index
+# (team_id, channel_id, pseudo) -> user_id for mention lookups.
+# last_used refreshes are only written once the stored value is older than
+# PSEUDO_REFRESH_INTERVAL, so the database may lag behind the real last use by
+# up to that interval. Stored rows are always checked with that interval as
+# grace, so the validity window can reach validity_hours + PSEUDO_REFRESH_INTERVAL.
+# The cache only ever proves a pseudo valid: another process may have used it
+# since without writing, so a cached last use never expires a pseudo.
+PSEUDO_REFRESH_INTERVAL = timedelta(minutes=5)
+_pseudo_cache = {}
+_pseudo_owners = {}
+
+
+def _cache_pseudo(team_id, user_id, channel_id, pseudo, last_used, persisted):
+    """Store a pseudo in the in-process cache and its reverse index"""
+    _uncache_pseudo((team_id, user_id, channel_id))
+    _pseudo_cache[(team_id, user_id, channel_id)] = {'pseudo': pseudo, 'last_used': last_used, 'persisted': persisted}
+    _pseudo_owners[(team_id, channel_id, pseudo)] = user_id
+
+
+def _uncache_pseudo(key):
+    """Drop a pseudo from the in-process cache and its reverse index"""
+    entry = _pseudo_cache.pop(key, None)
+    if entry:
+        team_id, user_id, channel_id = key
+        owner_key = (team_id, channel_id, entry['pseudo'])
+        if _pseudo_owners.get(owner_key) == user_id:
+            del _pseudo_owners[owner_key]
+
+
+def _is_stored_pseudo_valid(key, pseudo, last_used, expiry):
+    """Check a stored pseudo, also trusting a more recent use seen by this process
+    
+    Args:
+        key (tuple): The (team_id, user_id, channel_id) of the row
+        pseudo (str): The stored pseudo
+        last_used (datetime): The stored last_used
+        expiry (datetime): Pseudos last used before this are expired
+        
+    Returns:
+        bool: True if the pseudo is still valid
+    """
+    cached = _pseudo_cache.get(key)
+    if cached and cached['pseudo'] == pseudo and cached['last_used'] > expiry:
+        return True
+    # Uses seen by any process may not be written yet
+    return last_used > expiry - PSEUDO_REFRESH_INTERVAL
+
+
+def _flush_pseudo_refreshes(cur, team_id, now, validity_hours, touched=None):
+    """Write pending last_used refreshes of a workspace in a single batched UPDATE
+    
+    The cache is left untouched until the caller has committed and passed the
+    result to _apply_pseudo_refreshes.
+    
+    Args:
+        cur: An open database cursor on the workspace shard (the caller commits)
+        team_id (str): The Slack team ID
+        now (datetime): The current time
+        validity_hours (int): How long a pseudo remains valid, used to prune the cache
+        touched (tuple, optional): Key of a cached pseudo used now
+        
+    Returns:
+        list: (entry, last_used) pairs written
+    """
+    # Entries past the grace period can't tell us anything the database doesn't
+    stale = now - timedelta(hours=validity_hours) - PSEUDO_REFRESH_INTERVAL
+
+    pending = []
+    for key, entry in list(_pseudo_cache.items()):
+        last_used = now if key == touched else entry['last_used']
+        if last_used <= stale:
+            _uncache_pseudo(key)
+        elif key[0] == team_id and last_used > entry['persisted']:
+            pending.append((key, entry, last_used))
+
+    if not pending:
+        return []
+
+    # Never move back a more recent use written by another process
+    execute_values(
+        cur,
+        '''
+        UPDATE pseudos SET last_used = GREATEST(pseudos.last_used, v.last_used)
+        FROM (VALUES %s) AS v (team_id, user_id, channel_id, pseudo, last_used)
+        WHERE pseudos.team_id = v.team_id AND pseudos.user_id = v.user_id
+          AND pseudos.channel_id = v.channel_id AND pseudos.pseudo = v.pseudo
+        ''',
+        [(team_id, user_id, channel_id, entry['pseudo'], last_used) for (_, user_id, channel_id), entry, last_used in pending],
+        page_size=len(pending)
+    )
+    return [(entry, last_used) for _, entry, last_used in pending]
+
 
+def _apply_pseudo_refreshes(written):
+    """Record committed last_used refreshes in the cache
+    
+    Args:
+        written (list): (entry, last_used) pairs returned by _flush_pseudo_refreshes
+    """
+    for entry, last_used in written:
+        entry['last_used'] = max(entry['last_used'], last_used)
+        entry['persisted'] = max(entry['persisted'], last_used)
+
+
+def get_or_assign_pseudo(team_id, user_id, channel_id, validity_hours=1) -> str:
+    """Get or assign a pseudo for a user in a channel
+    
+    A pseudo stays valid for validity_hours after its last use, up to
+    PSEUDO_REFRESH_INTERVAL longer when that use was seen by another process.
+    """
     now = datetime.now()
     expiry = now - timedelta(hours=validity_hours)
+    key = (team_id, user_id, channel_id)
+
+    # Fast path: pseudo already known by this process and still valid
+    cached = _pseudo_cache.get(key)
+    if cached and cached['last_used'] > expiry:
+        if now - cached['persisted'] < PSEUDO_REFRESH_INTERVAL:
+            cached['last_used'] = now
+            return cached['pseudo']
+
+        # The stored last_used is getting stale, refresh it along with any
+        # other pending refreshes
+        conn = get_db_connection(team_id)
+        cur = conn.cursor()
+        written = _flush_pseudo_refreshes(cur, team_id, now, validity_hours, touched=key)
+        conn.commit()
+        cur.close()
+        conn.close()
+        _apply_pseudo_refreshes(written)
+        return cached['pseudo']
+
+    conn = get_db_connection(team_id)
+    cur = conn.cursor()
 
     # Check existing record
-    cur.execute('SELECT pseudo, last_used FROM pseudos WHERE user_id = %s AND channel_id = %s', (user_id, channel_id))
+    cur.execute('SELECT pseudo, last_used FROM pseudos WHERE team_id = %s AND user_id = %s AND channel_id = %s',
+               (team_id, user_id, channel_id))
     result = cur.fetchone()
 
     # Case 1: user already has a pseudo AND it's still valid
     if result:
         pseudo, last_used = result
-        if last_used and last_used > expiry:
-            cur.execute('UPDATE pseudos SET last_used = %s WHERE user_id = %s AND channel_id = %s', 
-                       (now, user_id, channel_id))
-            conn.commit()
+        if last_used and _is_stored_pseudo_valid(key, pseudo, last_used, expiry):
+            if now - last_used < PSEUDO_REFRESH_INTERVAL:
+                _cache_pseudo(team_id, user_id, channel_id, pseudo, now, last_used)
+            else:
+                # Cache the stored use only, this one counts once written
+                _cache_pseudo(team_id, user_id, channel_id, pseudo, last_used, last_used)
+                written = _flush_pseudo_refreshes(cur, team_id, now, validity_hours, touched=key)
+                conn.commit()
+                _apply_pseudo_refreshes(written)
             cur.close()
             conn.close()
             return pseudo
 
     # Case 2: user needs a new pseudo
-    # Get used pseudos in this channel that are still valid
-    cur.execute('SELECT pseudo FROM pseudos WHERE channel_id = %s AND last_used > %s', (channel_id, expiry))
+    # Get used pseudos in this channel that are still valid, with the grace
+    # period so a pseudo possibly still in use elsewhere is not handed out
+    cur.execute('SELECT pseudo FROM pseudos WHERE team_id = %s AND channel_id = %s AND last_used > %s',
+               (team_id, channel_id, expiry - PSEUDO_REFRESH_INTERVAL))
     used_pseudos = {row[0] for row in cur.fetchall()}
 
     available = [p for p in PSEUDOS if p not in used_pseudos]
@@ -170,24 +453,34 @@ def get_or_assign_pseudo(user_id, channel_id, validity_hours=1) -> str:
 
     if result:
         # Update existing expired record
-        cur.execute('UPDATE pseudos SET pseudo = %s, last_used = %s WHERE user_id = %s AND channel_id = %s',
-                   (new_pseudo, now, user_id, channel_id))
+        cur.execute('UPDATE pseudos SET pseudo = %s, last_used = %s WHERE team_id = %s AND user_id = %s AND channel_id = %s',
+                   (new_pseudo, now, team_id, user_id, channel_id))
     else:
         # Create new record
-        cur.execute('INSERT INTO pseudos (user_id, channel_id, pseudo, last_used) VALUES (%s, %s, %s, %s)',
-                   (user_id, channel_id, new_pseudo, now))
+        cur.execute('INSERT INTO pseudos (team_id, user_id, channel_id, pseudo, last_used) VALUES (%s, %s, %s, %s, %s)',
+                   (team_id, user_id, channel_id, new_pseudo, now))
+
+    # Piggyback any pending refreshes on this write
+    written = _flush_pseudo_refreshes(cur, team_id, now, validity_hours)
 
     conn.commit()
     cur.close()
     conn.close()
 
+    _apply_pseudo_refreshes(written)
+    _cache_pseudo(team_id, user_id, channel_id, new_pseudo, now, now)
+
     return new_pseudo
 
 
-def get_user_by_pseudo(pseudo, channel_id, validity_hours=1) -> str | None:
+def get_user_by_pseudo(team_id, pseudo, channel_id, validity_hours=1) -> str | None:
     """Get user_id by pseudo in a channel if the pseudo is still valid
     
+    The pseudo is valid for validity_hours after its last use, up to
+    PSEUDO_REFRESH_INTERVAL longer when that use was seen by another process.
+    
     Args:
+        team_id (str): The Slack team ID
         pseudo (str): The pseudo to look up
         channel_id (str): The Slack channel ID
         validity_hours (int): How long a pseudo remains valid
@@ -195,21 +488,31 @@ def get_user_by_pseudo(pseudo, channel_id, validity_hours=1) -> str | None:
     Returns:
         str | None: The user_id if found and valid, None otherwise
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
+    now = datetime.now()
+    expiry = now - timedelta(hours=validity_hours)
 
-    expiry = datetime.now() - timedelta(hours=validity_hours)
+    # Entries cached by this process carry the exact last use
+    owner = _pseudo_owners.get((team_id, channel_id, pseudo))
+    if owner and _pseudo_cache[(team_id, owner, channel_id)]['last_used'] > expiry:
+        return owner
+
+    conn = get_db_connection(team_id)
+    cur = conn.cursor()
 
     cur.execute(
-        'SELECT user_id FROM pseudos WHERE pseudo = %s AND channel_id = %s AND last_used > %s',
-        (pseudo, channel_id, expiry)
+        'SELECT user_id, last_used FROM pseudos WHERE team_id = %s AND pseudo = %s AND channel_id = %s AND last_used > %s',
+        (team_id, pseudo, channel_id, expiry - PSEUDO_REFRESH_INTERVAL)
     )
-    result = cur.fetchone()
+    rows = cur.fetchall()
 
     cur.close()
     conn.close()
 
-    return result[0] if result else None
+    for user_id, last_used in rows:
+        if _is_stored_pseudo_valid((team_id, user_id, channel_id), pseudo, last_used, expiry):
+            return user_id
+
+    return None
 
 
 def get_known_pseudos() -> list:
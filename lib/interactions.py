@@ -0,0 +1,219 @@
+import os
+import re
+import json
+import requests
+from urllib.parse import parse_qs, unquote_plus
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from .slack import verify_slack_request, send_direct_message, update_message_via_response_url
+from .workspaces import get_workspace
+
+# Bounded patterns to find the workspace of a raw interaction body without
+# decoding its JSON. Quotes inside JSON strings are escaped, so these only
+# match actual keys.
+TEAM_ID_PATTERN = re.compile(r'"team":\s*\{[^{}]{0,200}?"id":\s*"([A-Z0-9]{1,32})"')
+USER_TEAM_ID_PATTERN = re.compile(r'"team_id":\s*"([A-Z0-9]{1,32})"')
+ENTERPRISE_ID_PATTERN = re.compile(r'"enterprise":\s*\{[^{}]{0,200}?"id":\s*"([A-Z0-9]{1,32})"')
+
+# Button side effects run here once the interaction has been acknowledged
+executor = ThreadPoolExecutor(max_workers=8)
+
+
+def _match(pattern, text):
+    match = pattern.search(text)
+    return match.group(1) if match else None
+
+
+def read_interaction(headers, body):
+    """Authenticate and decode an interaction request
+
+    The signature is checked against the raw body, with the signing secret of
+    the single workspace found in it, before any JSON is decoded.
+
+    Args:
+        headers: The request headers
+        body (str): The raw form encoded request body
+
+    Returns:
+        tuple: (status, payload, workspace) where status is the HTTP error to
+            answer with, or None if the request is valid
+    """
+    text = unquote_plus(body)
+    team_id = _match(TEAM_ID_PATTERN, text) or _match(USER_TEAM_ID_PATTERN, text)
+    enterprise_id = _match(ENTERPRISE_ID_PATTERN, text)
+
+    workspace = get_workspace(team_id, enterprise_id)
+    if workspace is None:
+        return 401, None, None
+
+    # Verify request is from Slack only in production
+    if os.getenv('VERCEL_ENV') == 'production':
+        timestamp = headers.get('X-Slack-Request-Timestamp')
+        signature = headers.get('X-Slack-Signature')
+
+        if not timestamp or not signature or not workspace['signing_secret'] or not verify_slack_request(timestamp, body, signature, workspace['signing_secret']):
+            return 401, None, None
+
+    # Parse the payload
+    params = parse_qs(body)
+    payload_str = params.get('payload', [''])[0]
+
+    try:
+        payload = json.loads(payload_str)
+    except json.JSONDecodeError:
+        return 400, None, None
+    if not isinstance(payload, dict):
+        return 400, None, None
+
+    # The decoded payload must name the workspace the body was verified for.
+    # team is null for some org-level interactions, the user still carries it
+    payload_team_id = (payload.get('team') or {}).get('id') or (payload.get('user') or {}).get('team_id')
+    if payload_team_id != team_id:
+        return 401, None, None
+
+    return None, payload, workspace
+
+
+def go_button_effects(payload, action, workspace):
+    """Side effects of the "Go" button: notify the original poster and remove the button
+
+    Args:
+        payload (dict): The interaction payload
+        action (dict): The clicked action
+        workspace (dict): The workspace the interaction comes from
+
+    Returns:
+        list: (name, callable) side effects to run
+    """
+    # Get the original poster's user ID from the button value
+    original_poster_id = action.get('value')
+    # Get the user who clicked the button
+    button_clicker_id = (payload.get('user') or {}).get('id')
+
+    if not original_poster_id or not button_clicker_id:
+        return []
+
+    # Envoyer un message privé à l'auteur original
+    message = f"Hé ! Quelqu'un veut que tu viennes jouer ! 🎮"
+    effects = [
+        ('send_direct_message', partial(send_direct_message, original_poster_id, message, workspace['bot_token']))
+    ]
+
+    # Update the original message using response_url
+    response_url = payload.get('response_url')
+    if response_url:
+        # Get the original message text from the payload
+        original_message = payload.get('message') or {}
+        original_text = original_message.get('text', '')
+
+        # Update the message in place without the button
+        blocks = [
+            {
+                'type': 'section',
+                'text': {
+                    'type': 'mrkdwn',
+                    'text': original_text
+                }
+            }
+        ]
+        effects.append(
+            ('update_message_via_response_url', partial(update_message_via_response_url, response_url, original_text, blocks))
+        )
+
+    return effects
+
+
+# Side effects builders by action_id
+ACTION_HANDLERS = {
+    'go_button': go_button_effects,
+}
+
+
+def collect_effects(payload, workspace):
+    """Get the side effects of the clicked actions of an interaction
+
+    Args:
+        payload (dict): The interaction payload
+        workspace (dict): The workspace the interaction comes from
+
+    Returns:
+        list: (name, callable) side effects to run
+    """
+    effects = []
+    if payload.get('type') == 'block_actions':
+        for action in payload.get('actions') or []:
+            if not isinstance(action, dict):
+                continue
+            build_effects = ACTION_HANDLERS.get(action.get('action_id'))
+            if build_effects:
+                effects.extend(build_effects(payload, action, workspace))
+    return effects
+
+
+def run_effects(effects):
+    """Run side effects concurrently and log their results
+
+    Args:
+        effects (list): (name, callable) side effects to run
+    """
+    futures = {executor.submit(effect): name for name, effect in effects}
+    for future in as_completed(futures):
+        try:
+            print(f"{futures[future]}: {future.result()}")
+        except Exception as e:
+            print(f"Error running {futures[future]}: {e}")
+
+
+def get_worker_url():
+    """Get the URL of the api/actions worker, None when side effects run in process
+
+    Per-deployment URLs (VERCEL_URL) sit behind Vercel Deployment Protection,
+    so only the stable production domain is used by default.
+    """
+    if os.getenv('ACTIONS_WORKER_URL'):
+        return os.getenv('ACTIONS_WORKER_URL')
+    if os.getenv('VERCEL_ENV') == 'production' and os.getenv('VERCEL_PROJECT_PRODUCTION_URL'):
+        return f"https://{os.getenv('VERCEL_PROJECT_PRODUCTION_URL')}/api/actions"
+    return None
+
+
+def dispatch_to_worker(worker_url, headers, body) -> bool:
+    """Hand an interaction over to the worker without waiting for it to finish
+
+    The original signed request is forwarded as is, so the worker verifies it
+    exactly like Slack's own requests. This costs a connection to the worker
+    (bounded by a 1s connect timeout) plus up to 50ms waiting for an early
+    error. The worker is not kept on a keep-alive session: the connection is
+    dropped whenever we stop waiting for its answer, so it could not be reused.
+
+    Args:
+        worker_url (str): The URL of the api/actions worker
+        headers: The original request headers
+        body (str): The original raw request body
+
+    Returns:
+        bool: True if the worker took the interaction, False if the side
+            effects must run in process
+    """
+    try:
+        response = requests.post(
+            worker_url,
+            headers={
+                'Content-Type': 'application/x-www-form-urlencoded',
+                'X-Slack-Request-Timestamp': headers.get('X-Slack-Request-Timestamp', ''),
+                'X-Slack-Signature': headers.get('X-Slack-Signature', '')
+            },
+            data=body.encode('utf-8'),
+            timeout=(1, 0.05)
+        )
+    except requests.exceptions.ReadTimeout:
+        # The request is sent and the worker is busy with it
+        return True
+    except Exception as e:
+        print(f"Error dispatching interaction to worker: {e}")
+        return False
+
+    if not 200 <= response.status_code < 300:
+        print(f"Error dispatching interaction to worker: HTTP {response.status_code}")
+        return False
+    return True
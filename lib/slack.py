@@ -1,17 +1,16 @@
-import os
 import hmac
 import hashlib
 import requests
 from datetime import datetime
 
-def verify_slack_request(timestamp, body, signature):
-    """Verify that the request actually came from Slack"""
+def verify_slack_request(timestamp, body, signature, signing_secret):
+    """Verify that the request actually came from Slack, signed with the workspace signing secret"""
     if abs(datetime.now().timestamp() - int(timestamp)) > 60 * 5:
         return False
 
     sig_basestring = f"v0:{timestamp}:{body}".encode('utf-8')
     my_signature = 'v0=' + hmac.new(
-        os.getenv('SLACK_SIGNING_SECRET').encode('utf-8'),
+        signing_secret.encode('utf-8'),
         sig_basestring,
         hashlib.sha256
     ).hexdigest()
@@ -19,22 +18,27 @@ def verify_slack_request(timestamp, body, signature):
     return hmac.compare_digest(my_signature, signature)
 
 
-def send_direct_message(user_id, message):
+def send_direct_message(user_id, message, bot_token):
     """Send a direct message to a Slack user
     
     Args:
         user_id (str): The Slack user ID to send the message to
         message (str): The message content to send
+        bot_token (str): The bot token of the user's workspace
         
     Returns:
         bool: True if message was sent successfully, False otherwise
     """
+    if not bot_token:
+        print("Error sending direct message: no bot token configured for this workspace")
+        return False
+
     try:
         response = requests.post(
             'https://slack.com/api/chat.postMessage',
             headers={
                 'Content-Type': 'application/json',
-                'Authorization': f'Bearer {os.getenv("SLACK_BOT_TOKEN")}'
+                'Authorization': f'Bearer {bot_token}'
             },
             json={
                 'channel': user_id,
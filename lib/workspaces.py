@@ -0,0 +1,77 @@
+import os
+import json
+
+# Workspace shard map, read from the SLACK_WORKSPACES environment variable as a
+# JSON object keyed by team_id, or by enterprise_id for an org-wide install
+# shared by every workspace of an Enterprise Grid org:
+#
+#   {
+#       "T0123": {
+#           "database_url": "postgres://...",
+#           "schema": "team_t0123",
+#           "signing_secret": "...",
+#           "bot_token": "xoxb-..."
+#       }
+#   }
+#
+# Every field is optional and falls back to DATABASE_URL, SLACK_SIGNING_SECRET
+# and SLACK_BOT_TOKEN, so a single-workspace deployment needs no map at all.
+# Storage stays keyed by team_id: Slack sends the team_id of the workspace a
+# request comes from even for org-wide installs, so it is unique on its own.
+_workspaces = None
+
+# team_id -> enterprise_id of workspaces served through their org entry, so
+# later lookups by team_id alone (e.g. database connections) are routed the same
+_team_enterprises = {}
+
+
+def _load_workspaces():
+    """Load the workspace shard map once per process"""
+    global _workspaces
+    if _workspaces is None:
+        _workspaces = json.loads(os.getenv('SLACK_WORKSPACES') or '{}')
+    return _workspaces
+
+
+def get_workspace(team_id, enterprise_id=None) -> dict | None:
+    """Get the storage and credentials of a workspace
+
+    The signing secret and bot token may be None outside of production, they
+    are only required where they are used.
+
+    Args:
+        team_id (str): The Slack team ID
+        enterprise_id (str, optional): The Enterprise Grid org ID, used when the
+            workspace itself is not in the shard map
+
+    Returns:
+        dict | None: The workspace config with 'team_id', 'database_url', 'schema',
+            'signing_secret' and 'bot_token' keys, None if the workspace is unknown
+    """
+    if not team_id:
+        return None
+
+    workspaces = _load_workspaces()
+    enterprise_id = enterprise_id or _team_enterprises.get(team_id)
+    config = workspaces.get(team_id)
+    if config is None and enterprise_id:
+        config = workspaces.get(enterprise_id)
+        if config is not None:
+            _team_enterprises[team_id] = enterprise_id
+
+    # Once a shard map is configured, only listed workspaces are served
+    if config is None and workspaces:
+        return None
+    config = config or {}
+
+    workspace = {
+        'team_id': team_id,
+        'database_url': config.get('database_url', os.getenv('DATABASE_URL')),
+        'schema': config.get('schema'),
+        'signing_secret': config.get('signing_secret', os.getenv('SLACK_SIGNING_SECRET')),
+        'bot_token': config.get('bot_token', os.getenv('SLACK_BOT_TOKEN')),
+    }
+    if not workspace['database_url']:
+        return None
+
+    return workspace